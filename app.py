@@ -1,20 +1,32 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, send_file
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.exc import IntegrityError
 from flask_cors import CORS
 from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity, get_jwt
 from functools import wraps
-from models import db, User, Artwork, ArtworkLike, Contact, Admin
+from models import db, User, Artwork, ArtworkLike, Contact, Admin, SimilarArtwork
+import stats
+import styles
+import profiling
+from idempotency import idempotent, purge_expired
+from events import EventHub
+import archive
+from resilience import OutboundClient, OutboundUnavailable
+from user_cache import user_cache, get_user_record, invalidate_user
 from werkzeug.security import generate_password_hash, check_password_hash
 import cloudinary
 from cloudinary.uploader import upload
 import cloudinary.api
+import cloudinary.exceptions
 from dotenv import load_dotenv
 # from flask_mail import Mail, Message
 from sendgrid import SendGridAPIClient
 from sendgrid.helpers.mail import Mail
+from python_http_client.exceptions import BadRequestsError
 import os
+import click
+from datetime import datetime
 
 # Load environment variables from .env file
 load_dotenv()
@@ -24,6 +36,34 @@ app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['JWT_SECRET_KEY'] = 'your-secret-key'  # Replace with a strong secret key
 
+# Request profiling (admins can also send `X-Profile: 1`)
+app.config['PROFILE_SAMPLE_RATE'] = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+app.config['PROFILE_DIR'] = os.getenv("PROFILE_DIR", "/tmp/profiles")
+app.config['PROFILE_MAX_FILES'] = int(os.getenv("PROFILE_MAX_FILES", 50))
+
+# Idempotency-Key handling for retried POSTs
+app.config['IDEMPOTENCY_TTL_HOURS'] = int(os.getenv("IDEMPOTENCY_TTL_HOURS", 24))
+app.config['IDEMPOTENCY_WAIT_SECONDS'] = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", 30))
+app.config['IDEMPOTENCY_LOCK_SECONDS'] = float(os.getenv("IDEMPOTENCY_LOCK_SECONDS", 120))
+
+# Live artwork events (SQLite file shared by all workers on the host)
+app.config['EVENTS_DB_PATH'] = os.getenv("EVENTS_DB_PATH", "/tmp/artwork_events.db")
+app.config['EVENTS_BUFFER_SIZE'] = int(os.getenv("EVENTS_BUFFER_SIZE", 100))
+# Each open stream holds a gthread thread: keep this well below the Procfile's --threads
+app.config['EVENTS_MAX_SUBSCRIBERS'] = int(os.getenv("EVENTS_MAX_SUBSCRIBERS", 4))
+app.config['EVENTS_MAX_STREAM_SECONDS'] = int(os.getenv("EVENTS_MAX_STREAM_SECONDS", 300))
+
+# Contacts older than this are moved to the archive by `flask archive-contacts`
+app.config['CONTACT_RETENTION_DAYS'] = int(os.getenv("CONTACT_RETENTION_DAYS", 180))
+
+# Outbound providers: timeouts (seconds), concurrent calls per worker and circuit breaker
+app.config['CLOUDINARY_TIMEOUT'] = float(os.getenv("CLOUDINARY_TIMEOUT", 15))
+app.config['CLOUDINARY_MAX_CONCURRENT'] = int(os.getenv("CLOUDINARY_MAX_CONCURRENT", 4))
+app.config['SENDGRID_TIMEOUT'] = float(os.getenv("SENDGRID_TIMEOUT", 5))
+app.config['SENDGRID_MAX_CONCURRENT'] = int(os.getenv("SENDGRID_MAX_CONCURRENT", 2))
+app.config['OUTBOUND_FAILURE_THRESHOLD'] = int(os.getenv("OUTBOUND_FAILURE_THRESHOLD", 5))
+app.config['OUTBOUND_RESET_SECONDS'] = float(os.getenv("OUTBOUND_RESET_SECONDS", 30))
+
 cloudinary.config(
     cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
     api_key=os.getenv("CLOUDINARY_API_KEY"),
@@ -41,12 +81,40 @@ mail = Mail(app)
 
 # Send grid
 sendgrid_client = SendGridAPIClient(os.getenv("SENDGRID_API_KEY"))
+sendgrid_client.client.timeout = app.config['SENDGRID_TIMEOUT']  # Socket timeout, inherited by sub-clients
+
+# Timeouts, bulkheads and circuit breakers around the external providers
+cloudinary_client = OutboundClient(
+    'cloudinary', upload,
+    timeout=app.config['CLOUDINARY_TIMEOUT'],
+    max_concurrent=app.config['CLOUDINARY_MAX_CONCURRENT'],
+    failure_threshold=app.config['OUTBOUND_FAILURE_THRESHOLD'],
+    reset_timeout=app.config['OUTBOUND_RESET_SECONDS'],
+    ignore=(cloudinary.exceptions.BadRequest,),
+)
+sendgrid_mail = OutboundClient(
+    'sendgrid', sendgrid_client.send,
+    timeout=app.config['SENDGRID_TIMEOUT'],
+    max_concurrent=app.config['SENDGRID_MAX_CONCURRENT'],
+    failure_threshold=app.config['OUTBOUND_FAILURE_THRESHOLD'],
+    reset_timeout=app.config['OUTBOUND_RESET_SECONDS'],
+    ignore=(BadRequestsError,),
+)
+
+# Live events
+event_hub = EventHub(
+    app.config['EVENTS_DB_PATH'],
+    buffer_size=app.config['EVENTS_BUFFER_SIZE'],
+    max_subscribers=app.config['EVENTS_MAX_SUBSCRIBERS'],
+    max_stream_seconds=app.config['EVENTS_MAX_STREAM_SECONDS'],
+)
 
 # Initialize extensions
 db.init_app(app)
 migrate = Migrate(app, db)
 CORS(app)
 jwt = JWTManager(app)
+profiling.init_profiling(app)
 
 # Set to keep track of revoked tokens
 revoked_tokens = set()
@@ -73,6 +141,25 @@ def get_artwork_data_with_likes(artwork, user_id):
     artwork_data["user_has_liked"] = user_has_liked
     return artwork_data
 
+def upload_image(image_file):
+    """Upload to Cloudinary through the protected client; returns the secure URL."""
+    upload_result = cloudinary_client.call(image_file, timeout=app.config['CLOUDINARY_TIMEOUT'])
+    return upload_result.get('secure_url')
+
+def provider_error(error):
+    """
+    5xx for an upload that failed on Cloudinary's side: 503 when the provider
+    is down, timing out or saturated, 502 for any other provider error.
+    Only Cloudinary's BadRequest is the client's fault (400, handled by callers).
+    A 5xx also lets @idempotent release the key so the client can retry.
+    """
+    if isinstance(error, OutboundUnavailable):
+        response = jsonify({"message": "Image service temporarily unavailable, please retry", "error": str(error)})
+        if error.retry_after is not None:
+            response.headers['Retry-After'] = str(error.retry_after)
+        return response, 503
+    return jsonify({"message": "Image upload failed, please retry", "error": str(error)}), 502
+
 # INDEX ROUTE
 @app.route('/')
 def home():
@@ -80,20 +167,23 @@ def home():
 
 # USER ROUTES
 @app.route('/api/register', methods=['POST'])
+@idempotent
 def register_user():
     data = request.form
     image_file = request.files.get('profile_image')  # Retrieve the image file
     profile_image = None
 
+    # Check before the upload so a duplicate doesn't pay for it
+    if User.query.filter_by(email=data['email']).first():
+        return jsonify({"message": "Email already registered"}), 409
+
     if image_file:
         try:
-            upload_result = upload(image_file)
-            profile_image = upload_result.get('secure_url')
-        except Exception as e:
+            profile_image = upload_image(image_file)
+        except cloudinary.exceptions.BadRequest as e:
             return jsonify({"message": "Image upload failed", "error": str(e)}), 400
-
-    if User.query.filter_by(email=data['email']).first():
-        return jsonify({"message": "Email already registered"}), 409
+        except Exception as e:
+            return provider_error(e)
 
     new_user = User(
         username=data['username'],
@@ -102,6 +192,7 @@ def register_user():
     )
     new_user.set_password(data['password'])
     db.session.add(new_user)
+    stats.record_user(new_user)
     db.session.commit()
 
     # Send confirmation email
@@ -122,10 +213,9 @@ def send_confirmation_email(to_email, username):
         plain_text_content=body
     )
 
-    # Send the email using SendGrid
+    # Send the email using SendGrid (fails fast while SendGrid is down)
     try:
-        sendgrid_client = SendGridAPIClient(os.getenv("SENDGRID_API_KEY"))
-        response = sendgrid_client.send(message)
+        response = sendgrid_mail.call(message)
         print(f"Email sent! Status Code: {response.status_code}")
     except Exception as e:
         print(f"An error occurred while sending the email: {e}")
@@ -194,8 +284,10 @@ def delete_user(id):
     user = User.query.get(id)
     if not user:
         return jsonify({"message":"User not found"}), 404
+    stats.record_user(user, -1)
     db.session.delete(user)
     db.session.commit()
+    invalidate_user(id)
     return jsonify({'message':'User deleted succesfully'}),200
 # put goes here
 
@@ -222,22 +314,24 @@ def update_user(id):
     profile_image = request.files.get('profile_image')
     if profile_image:
         try:
-            upload_result = upload(profile_image)  # Ensure this is properly defined
-            user.profile_image = upload_result.get('secure_url')
-        except Exception as e:
+            user.profile_image = upload_image(profile_image)
+        except cloudinary.exceptions.BadRequest as e:
             return jsonify({"message": f"Image upload failed: {str(e)}"}), 400
+        except Exception as e:
+            return provider_error(e)
     
     db.session.commit()
+    invalidate_user(id)
     return jsonify({"message": "User profile updated successfully"}), 200
 
 @app.route('/api/users/me', methods=['GET'])
 @jwt_required()
 def get_user_profile():
     current_user_id = get_jwt_identity().get("id")
-    user = User.query.get(current_user_id)
+    user = get_user_record(current_user_id)
     if not user:
         return jsonify({"message": "User not found"}), 404
-    return jsonify(user.to_dict()), 200
+    return jsonify(user), 200
 
 # me goes here
 
@@ -258,6 +352,7 @@ def change_password():
     
     user.set_password(new_password)
     db.session.commit()
+    invalidate_user(current_user_id)
     return jsonify({"message": "Password updated successfully"}), 200
 
 @app.route('/api/users/me/liked-artworks', methods=['GET'])
@@ -286,6 +381,7 @@ def get_liked_artworks():
 # ARTWORK ROUTES
 @app.route('/api/artworks/submit', methods=['POST', 'OPTIONS'])
 @jwt_required()
+@idempotent
 # @admin_required
 
 def submit_artwork():
@@ -299,24 +395,69 @@ def submit_artwork():
     
     if not image_file:
         return jsonify({"message": "No image file provided"}), 400
+
+    if not styles.canonical_style(data['style']):
+        return jsonify({"message": "Style is required"}), 400
     
     # Upload the image to Cloudinary
-    upload_result = upload(image_file)
-    image_url = upload_result.get('secure_url')  # Get the secure URL from Cloudinary
+    try:
+        image_url = upload_image(image_file)  # Get the secure URL from Cloudinary
+    except cloudinary.exceptions.BadRequest as e:
+        return jsonify({"message": "Image upload failed", "error": str(e)}), 400
+    except Exception as e:
+        return provider_error(e)
 
     new_artwork = Artwork(
         name=data['name'],
         email=data['email'],
         image_url=image_url,  # Save the Cloudinary URL
-        style=data['style'],
         description=data['description'],
         user_id=current_user_id  # Link to the logged-in user
     )
+    styles.assign_style(new_artwork, data['style'])  # Canonical style + catalog count
     db.session.add(new_artwork)
+    stats.record_artwork(new_artwork)
     db.session.commit()
+    event_hub.publish('submission', artwork_id=new_artwork.id, style=new_artwork.style, artwork=new_artwork.to_dict())
 
     return jsonify({"message": "Artwork submitted successfully", "image_url": image_url}), 201
 
+@app.route('/api/styles', methods=['GET'])
+@jwt_required()
+def get_styles():
+    """
+    List the style catalog with the number of artworks in each style.
+    """
+    return jsonify([style.to_dict() for style in styles.list_styles()]), 200
+
+@app.route('/api/artworks/events', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])  # EventSource can't set headers: ?jwt=<token>
+def artwork_events():
+    """
+    Server-sent events for likes, unlikes and new submissions.
+    Optional filters: ?styles=animated,static and/or ?artwork_ids=1,2
+    (an event is sent if it matches either). Reconnects resume from Last-Event-ID.
+    Streams are closed after EVENTS_MAX_STREAM_SECONDS; EventSource reconnects.
+    """
+    style_filter = [styles.canonical_style(style) for style in request.args.get('styles', '').split(',') if style.strip()]
+    try:
+        artwork_filter = [int(artwork_id) for artwork_id in request.args.get('artwork_ids', '').split(',') if artwork_id.strip()]
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({"message": "artwork_ids and Last-Event-ID must be integers"}), 400
+
+    subscriber = event_hub.subscribe(style_filter, artwork_filter, last_event_id)
+    if subscriber is None:
+        response = jsonify({"message": "Too many live event streams, please retry"})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    return Response(
+        event_hub.stream(subscriber),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
 @app.route('/api/artworks/<style>', methods=['GET'])
 @jwt_required()
 # @admin_required
@@ -326,7 +467,7 @@ def get_artworks_by_style(style):
     Fetch artworks by style with their total likes.
     """
     current_user_id = get_jwt_identity().get("id")
-    artworks = Artwork.query.filter_by(style=style).all()
+    artworks = Artwork.query.filter_by(style=styles.canonical_style(style)).all()
 
     artworks_with_likes = [get_artwork_data_with_likes(artwork, current_user_id) for artwork in artworks]
     return jsonify(artworks_with_likes), 200
@@ -354,7 +495,7 @@ def get_user_artworks(user_id):
     """
     Fetch all artworks by a specific user with their total likes.
     """
-    user = User.query.get(user_id)
+    user = get_user_record(user_id)
     if not user:
         return jsonify({"message": "User not found"}), 404
     
@@ -364,6 +505,28 @@ def get_user_artworks(user_id):
     artworks_with_likes = [get_artwork_data_with_likes(artwork, current_user_id) for artwork in artworks]
     return jsonify(artworks_with_likes), 200
 
+@app.route('/api/artworks/<int:id>/similar', methods=['GET'])
+@jwt_required()
+def get_similar_artworks(id):
+    """
+    Artworks most often liked by the same users, precomputed by `flask refresh-similar`.
+    """
+    limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+    similar = (
+        SimilarArtwork.query.options(db.joinedload(SimilarArtwork.similar_artwork))
+        .filter_by(artwork_id=id)
+        .order_by(SimilarArtwork.rank)
+        .limit(limit)
+        .all()
+    )
+    if not similar and not db.session.get(Artwork, id):
+        return jsonify({"message": "Artwork not found"}), 404
+
+    return jsonify([
+        {**row.similar_artwork.to_dict(), "similarity": round(row.score, 4)}
+        for row in similar
+    ]), 200
+
 @app.route('/api/artworks/<int:id>', methods=['DELETE'])
 @jwt_required()
 @admin_required
@@ -371,6 +534,8 @@ def delete_artwork(id):
     artwork = Artwork.query.get(id)
     if not artwork:
         return jsonify({"message": "Artwork not found"}), 404
+    stats.record_artwork_deleted(artwork)
+    styles.adjust_count(artwork.style_id, -1)
     db.session.delete(artwork)
     db.session.commit()
     return jsonify({"message": "Artwork deleted successfully"}), 200
@@ -397,10 +562,12 @@ def like_artwork(id):
     # Create a new like
     new_like = ArtworkLike(artwork_id=id, user_id=current_user_id)
     db.session.add(new_like)
+    stats.record_like(new_like)
     db.session.commit()
 
     # Optionally, return updated like count
     like_count = ArtworkLike.query.filter_by(artwork_id=id).count()
+    event_hub.publish('like', artwork_id=id, style=artwork.style, likes=like_count)
     return jsonify({"message": "Artwork liked successfully", "likes": like_count}), 200
 
 @app.route('/api/artworks/<int:id>/like', methods=['DELETE'])
@@ -425,12 +592,14 @@ def unlike_artwork(id):
         return jsonify({"message": "You have not liked this artwork"}), 400
 
     # Remove the like
+    stats.record_like(existing_like, -1)
     db.session.delete(existing_like)
     db.session.commit()
     print(f"Like removed for Artwork ID {id}, User ID {current_user_id}")
 
     # Optionally, return updated like count
     like_count = ArtworkLike.query.filter_by(artwork_id=id).count()
+    event_hub.publish('unlike', artwork_id=id, style=artwork.style, likes=like_count)
     return jsonify({"message": "Artwork unliked successfully", "likes": like_count}), 200
 
 
@@ -445,6 +614,7 @@ def create_contact():
         message=data['message']
     )
     db.session.add(new_contact)
+    stats.record_contact(new_contact)
     db.session.commit()
     return jsonify({"message": "Contact message submitted successfully"}), 201
 
@@ -480,10 +650,43 @@ def delete_contact(id):
     contact = Contact.query.get(id)
     if not contact:
         return jsonify({"message": "Contact not found"}), 404
+    stats.record_contact(contact, -1)
     db.session.delete(contact)
     db.session.commit()
     return jsonify({"message": "Contact deleted successfully"}), 200
 
+@app.route('/api/admin/contacts/archive', methods=['GET'])
+@jwt_required()
+@admin_required
+def search_archived_contacts():
+    """
+    Search archived contact messages.
+    Filters: ?email=, ?q= (text in the message), ?since=/?until= (YYYY-MM-DD),
+    paginated with ?page= and ?per_page=.
+    """
+    try:
+        since = request.args.get('since')
+        until = request.args.get('until')
+        since = datetime.strptime(since, '%Y-%m-%d') if since else None
+        until = datetime.strptime(until, '%Y-%m-%d') if until else None
+    except ValueError:
+        return jsonify({"message": "since and until must be dates in YYYY-MM-DD format"}), 400
+
+    results = archive.search_archive(
+        email=request.args.get('email'),
+        text=request.args.get('q'),
+        since=since,
+        until=until,
+        page=request.args.get('page', 1, type=int),
+        per_page=request.args.get('per_page', 50, type=int),
+    )
+    return jsonify({
+        "contacts": [contact.to_dict() for contact in results.items],
+        "page": results.page,
+        "per_page": results.per_page,
+        "total": results.total,
+    }), 200
+
 @app.route('/api/users/me/contacts', methods=['GET'])
 @jwt_required()
 def get_user_contacts():
@@ -491,12 +694,12 @@ def get_user_contacts():
     current_user_id = get_jwt_identity().get("id")
 
     # Query the user based on the ID
-    user = User.query.get(current_user_id)
+    user = get_user_record(current_user_id)
     if not user:
         return jsonify({"message": "User not found"}), 404
 
     # Query all contacts associated with the user
-    contacts = Contact.query.filter_by(email=user.email).all()
+    contacts = Contact.query.filter_by(email=user['email']).all()
 
     # If no contacts are found, return a message
     if not contacts:
@@ -548,6 +751,111 @@ def admin_login():
         return jsonify({"message": "Login successful!"}), 200
     else:
         return jsonify({"error": "Invalid username or password"}), 401
+
+@app.route('/api/admin/stats', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_admin_stats():
+    """
+    Dashboard totals read from the pre-aggregated counter table.
+    Per-day series cover the last `days` days (default 30).
+    """
+    days = request.args.get('days', 30, type=int)
+    if days < 1 or days > 366:
+        return jsonify({"message": "days must be between 1 and 366"}), 400
+    return jsonify(stats.get_dashboard(days)), 200
+
+@app.route('/api/admin/cache', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_cache_stats():
+    """
+    Hit/miss counters for this worker's user identity cache.
+    """
+    return jsonify({"user_cache": user_cache.stats()}), 200
+
+@app.route('/api/admin/outbound', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_outbound_metrics():
+    """
+    Per-provider call counters, latency and circuit breaker state for this worker.
+    """
+    return jsonify({client.name: client.metrics() for client in (cloudinary_client, sendgrid_mail)}), 200
+
+@app.route('/api/admin/profiles', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_profiles():
+    """
+    List captured request profiles, newest first.
+    """
+    return jsonify(profiling.list_profiles(app.config['PROFILE_DIR'])), 200
+
+@app.route('/api/admin/profiles/<profile_id>', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_profile(profile_id):
+    """
+    A single profile: route, timings, SQL statements and the top functions.
+    """
+    profile = profiling.load_profile(app.config['PROFILE_DIR'], profile_id)
+    if not profile:
+        return jsonify({"message": "Profile not found"}), 404
+    return jsonify(profile), 200
+
+@app.route('/api/admin/profiles/<profile_id>/download', methods=['GET'])
+@jwt_required()
+@admin_required
+def download_profile(profile_id):
+    """
+    Download the raw cProfile dump (open with pstats or snakeviz).
+    """
+    path = profiling.profile_dump_path(app.config['PROFILE_DIR'], profile_id)
+    if not path:
+        return jsonify({"message": "Profile not found"}), 404
+    return send_file(path, mimetype='application/octet-stream', as_attachment=True,
+                     download_name=f"{profile_id}.prof")
+
+@app.cli.command('migrate-styles')
+def migrate_styles_command():
+    """
+    Canonicalize existing artwork styles into the style catalog.
+
+    `flask db upgrade` creates the catalog and runs this backfill once;
+    the command re-runs it, e.g. after importing artworks directly.
+    """
+    migrated = styles.backfill()
+    print(f"Migrated {migrated} distinct style values")
+
+@app.cli.command('refresh-similar')
+@click.option('--full', is_flag=True, help='Recompute every artwork instead of only those touched by new likes.')
+@click.option('--k', default=20, show_default=True, help='Neighbours kept per artwork.')
+def refresh_similar_command(full, k):
+    """Refresh the similar-artworks table from the like matrix."""
+    import recommendations  # numpy/scipy are only needed by the job, not the web workers
+    refreshed = recommendations.refresh(full=full, k=k)
+    print(f"Refreshed similar artworks for {refreshed} artworks")
+
+@app.cli.command('purge-idempotency-keys')
+def purge_idempotency_keys_command():
+    """Delete stored Idempotency-Key responses past their TTL."""
+    print(f"Purged {purge_expired()} expired idempotency keys")
+
+@app.cli.command('archive-contacts')
+@click.option('--days', type=int, default=None, help='Archive contacts older than this (default: CONTACT_RETENTION_DAYS).')
+@click.option('--chunk-size', default=1000, show_default=True, help='Rows moved per transaction.')
+def archive_contacts_command(days, chunk_size):
+    """Move old contact messages into the archive table (run on a schedule)."""
+    days = days if days is not None else app.config['CONTACT_RETENTION_DAYS']
+    moved = archive.archive_contacts(days, chunk_size=chunk_size)
+    print(f"Archived {moved} contacts older than {days} days")
+
+@app.cli.command('rebuild-stats')
+def rebuild_stats_command():
+    """Recompute the admin dashboard counters from scratch."""
+    totals = stats.rebuild()
+    print(f"Stats rebuilt: {totals}")
     
 
 if __name__ == '__main__':
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+from sqlalchemy import select, insert, delete, literal
+from models import db, Contact, ArchivedContact
+
+
+def archive_contacts(older_than_days, chunk_size=1000):
+    """
+    Move contacts posted more than `older_than_days` ago into contact_archive.
+
+    Works in chunks of `chunk_size` rows, each in its own transaction, so
+    the hot table is never locked for long and an interrupted run can
+    simply be restarted. Returns the number of rows moved.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    moved = 0
+    while True:
+        ids = db.session.scalars(
+            select(Contact.id).where(Contact.posted_at < cutoff).order_by(Contact.id).limit(chunk_size)
+        ).all()
+        if not ids:
+            break
+
+        archived_at = datetime.utcnow()
+        db.session.execute(
+            insert(ArchivedContact).from_select(
+                ['id', 'name', 'email', 'message', 'posted_at', 'archived_at'],
+                select(Contact.id, Contact.name, Contact.email, Contact.message, Contact.posted_at,
+                       literal(archived_at)).where(Contact.id.in_(ids)),
+            )
+        )
+        db.session.execute(delete(Contact).where(Contact.id.in_(ids)))
+        db.session.commit()
+        moved += len(ids)
+    return moved
+
+
+def search_archive(email=None, text=None, since=None, until=None, page=1, per_page=50):
+    """Paginated search over archived contacts, newest first."""
+    query = ArchivedContact.query
+    if email:
+        query = query.filter(ArchivedContact.email == email)
+    if text:
+        # Match the user's text literally, not as LIKE wildcards
+        escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        query = query.filter(ArchivedContact.message.ilike(f"%{escaped}%", escape='\\'))
+    if since:
+        query = query.filter(ArchivedContact.posted_at >= since)
+    if until:
+        query = query.filter(ArchivedContact.posted_at < until)
+    return query.order_by(ArchivedContact.posted_at.desc(), ArchivedContact.id.desc()).paginate(
+        page=page, per_page=per_page, max_per_page=200, error_out=False
+    )
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for the similar-artworks job (recommendations.top_k_similar).
+
+Generates a synthetic like matrix with a power-law artwork popularity and
+times the similarity computation, without touching the database.
+
+    python bench_similar.py --likes 20000000 --users 2000000 --artworks 200000
+"""
+import argparse
+import time
+import numpy as np
+from recommendations import top_k_similar
+
+
+def synthetic_likes(n_likes, n_users, n_artworks, seed=0):
+    rng = np.random.default_rng(seed)
+    # Zipf-like popularity: a few artworks collect most of the likes
+    weights = 1.0 / np.arange(1, n_artworks + 1) ** 0.8
+    weights /= weights.sum()
+    artwork_ids = rng.choice(n_artworks, size=n_likes, p=weights) + 1
+    user_ids = rng.integers(1, n_users + 1, size=n_likes)
+    return user_ids, artwork_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--likes', type=int, default=10_000_000)
+    parser.add_argument('--users', type=int, default=1_000_000)
+    parser.add_argument('--artworks', type=int, default=100_000)
+    parser.add_argument('--k', type=int, default=20)
+    parser.add_argument('--block-size', type=int, default=1024)
+    parser.add_argument('--incremental', type=float, default=0.0,
+                        help='Fraction of artworks to recompute (simulates an incremental run)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    user_ids, artwork_ids = synthetic_likes(args.likes, args.users, args.artworks)
+    print(f"generated {args.likes:,} likes in {time.perf_counter() - start:.1f}s")
+
+    targets = None
+    like_counts = None
+    if args.incremental:
+        rng = np.random.default_rng(1)
+        targets = rng.choice(np.unique(artwork_ids), size=max(1, int(args.artworks * args.incremental)), replace=False)
+        # Like refresh(): only the likes of users who liked a target, plus global like counts
+        like_counts = np.unique(artwork_ids, return_counts=True)
+        subset = np.isin(user_ids, np.unique(user_ids[np.isin(artwork_ids, targets)]))
+        user_ids, artwork_ids = user_ids[subset], artwork_ids[subset]
+        print(f"incremental run loads {subset.sum():,} of {args.likes:,} likes")
+
+    start = time.perf_counter()
+    src, dst, scores, ranks = top_k_similar(user_ids, artwork_ids, k=args.k, targets=targets,
+                                            block_size=args.block_size, like_counts=like_counts)
+    elapsed = time.perf_counter() - start
+
+    print(f"computed {len(src):,} neighbour rows for {len(np.unique(src)):,} artworks in {elapsed:.1f}s")
+    print(f"throughput: {len(user_ids) / elapsed:,.0f} loaded likes/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Subscriber:
+    """One SSE connection: its filters and a bounded buffer of pending events."""
+
+    def __init__(self, styles=(), artwork_ids=(), maxsize=100):
+        self.styles = set(styles)
+        self.artwork_ids = set(artwork_ids)
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self.missed_history = False  # Replay could not go back as far as Last-Event-ID
+
+    def matches(self, event):
+        if not self.styles and not self.artwork_ids:
+            return True
+        return event.get('style') in self.styles or event.get('artwork_id') in self.artwork_ids
+
+    def offer(self, event):
+        """Never blocks: a slow consumer loses events and is told to resync."""
+        if not self.matches(event):
+            return
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def needs_resync(self):
+        return bool(self.dropped or self.missed_history)
+
+
+class EventHub:
+    """
+    Fan-out of artwork events across gunicorn workers.
+
+    Publishers append to a shared SQLite file (a stand-in for a real broker).
+    Each worker tails it from a single background thread and hands events
+    to its own subscribers. Rows older than `retention` seconds are pruned,
+    which also bounds how far back `Last-Event-ID` can replay; a client
+    resuming from an older id is sent a `resync` event.
+
+    Every open stream holds a worker thread, so a worker accepts at most
+    `max_subscribers` of them. Each stream is closed after `max_stream_seconds`,
+    and the client reconnects with Last-Event-ID, so long-lived clients
+    take turns for the slots.
+    """
+
+    def __init__(self, path, buffer_size=100, poll_interval=0.5, retention=300,
+                 max_subscribers=4, max_stream_seconds=300):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.max_subscribers = max_subscribers
+        self.max_stream_seconds = max_stream_seconds
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._last_id = 0
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connection(self):
+        """This thread's connection; the schema is set up once per process."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            with self._schema_lock:
+                if not self._schema_ready:
+                    conn.execute('PRAGMA journal_mode=WAL')
+                    conn.execute(
+                        'CREATE TABLE IF NOT EXISTS events ('
+                        'id INTEGER PRIMARY KEY AUTOINCREMENT, created_at REAL NOT NULL, data TEXT NOT NULL)'
+                    )
+                    self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+    def _reset_connection(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            conn.close()
+
+    def publish(self, event_type, **fields):
+        """Called after the database commit; a broker failure never fails the request."""
+        event = {'type': event_type, **fields}
+        try:
+            self._connection().execute(
+                'INSERT INTO events (created_at, data) VALUES (?, ?)', (time.time(), json.dumps(event))
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Could not publish {event_type} event: {e}")
+            self._reset_connection()
+
+    def subscribe(self, styles=(), artwork_ids=(), last_event_id=None):
+        """Returns a Subscriber, or None when this worker already has max_subscribers streams."""
+        self._ensure_poller()
+        subscriber = Subscriber(styles, artwork_ids, self.buffer_size)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            if last_event_id is not None:
+                self._replay(subscriber, last_event_id, upto=self._last_id)
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def _replay(self, subscriber, after_id, upto, page_size=1000):
+        """
+        Offer the subscriber what it missed, up to where live delivery starts.
+
+        Pages through every row rather than a buffer's worth, since the
+        filter is applied after reading. Stops early once the buffer
+        overflows, which already flags a resync.
+        """
+        oldest = self._connection().execute('SELECT MIN(id) FROM events').fetchone()[0]
+        if after_id < upto and (oldest is None or after_id + 1 < oldest):
+            subscriber.missed_history = True  # Pruned past retention
+        while after_id < upto and not subscriber.dropped:
+            events = self._read(after_id, upto=upto, limit=page_size)
+            if not events:
+                break
+            for event in events:
+                subscriber.offer(event)
+            after_id = events[-1]['id']
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def _read(self, after_id, upto=None, limit=1000):
+        sql = 'SELECT id, data FROM events WHERE id > ?'
+        params = [after_id]
+        if upto is not None:
+            sql += ' AND id <= ?'
+            params.append(upto)
+        rows = self._connection().execute(sql + ' ORDER BY id LIMIT ?', (*params, limit)).fetchall()
+        return [{**json.loads(data), 'id': event_id} for event_id, data in rows]
+
+    def _ensure_poller(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._last_id = self._connection().execute(
+                    'SELECT COALESCE(MAX(id), 0) FROM events'
+                ).fetchone()[0]
+                self._thread = threading.Thread(target=self._poll, name='event-hub', daemon=True)
+                self._thread.start()
+
+    def _poll(self):
+        last_prune = 0
+        while True:
+            try:
+                events = self._read(self._last_id)
+                for event in events:
+                    with self._lock:
+                        for subscriber in self._subscribers:
+                            subscriber.offer(event)
+                        self._last_id = event['id']
+
+                now = time.time()
+                if now - last_prune > 60:
+                    self._connection().execute('DELETE FROM events WHERE created_at < ?', (now - self.retention,))
+                    last_prune = now
+            except sqlite3.Error as e:
+                logger.warning(f"Event hub poll failed: {e}")
+                self._reset_connection()
+                events = None
+
+            if not events:
+                time.sleep(self.poll_interval)
+
+    def stream(self, subscriber, heartbeat=15):
+        """text/event-stream generator for one subscriber; unsubscribes on disconnect."""
+        deadline = time.monotonic() + self.max_stream_seconds
+        try:
+            yield f"retry: {int(self.poll_interval * 1000) + 2000}\n\n"
+            while time.monotonic() < deadline:
+                if subscriber.needs_resync():
+                    dropped, subscriber.dropped, subscriber.missed_history = subscriber.dropped, 0, False
+                    yield f"event: resync\ndata: {json.dumps({'dropped': dropped})}\n\n"
+                try:
+                    event = subscriber.queue.get(timeout=max(0.01, min(heartbeat, deadline - time.monotonic())))
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            self.unsubscribe(subscriber)
@@ -0,0 +1,173 @@
+import hashlib
+import hmac
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import current_app, request, jsonify, make_response
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from models import db, IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def idempotent(fn):
+    """
+    Replay the stored response when a POST is retried with the same
+    `Idempotency-Key` header.
+
+    The first request claims the key with a 'pending' row. Concurrent
+    duplicates wait for it to finish (up to IDEMPOTENCY_WAIT_SECONDS)
+    and then replay its response. Responses below 500 are kept for
+    IDEMPOTENCY_TTL_HOURS. A 5xx or an exception releases the key so the
+    client can retry.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if request.method != 'POST' or not key:
+            return fn(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({"message": f"{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters"}), 400
+
+        scope = _scope()
+        fingerprint = _fingerprint()
+        record, replay = _claim(scope, key, fingerprint)
+        if replay is not None:
+            return replay
+
+        try:
+            response = make_response(fn(*args, **kwargs))
+        except Exception:
+            db.session.rollback()
+            _release(record.id)
+            raise
+
+        if response.status_code >= 500:
+            _release(record.id)
+            return response
+
+        db.session.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.id == record.id)
+            .values(
+                status='completed',
+                status_code=response.status_code,
+                response_body=response.get_data(as_text=True),
+                content_type=response.content_type,
+            )
+        )
+        db.session.commit()
+        return response
+    return wrapper
+
+
+def _scope():
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+    except Exception:
+        identity = None
+    user_id = identity.get("id") if identity else None
+    return f"{request.endpoint}:{user_id}" if user_id is not None else request.endpoint
+
+
+def _fingerprint():
+    """
+    Keyed hash of the payload so a key reused for a different request is rejected.
+
+    An HMAC rather than a plain sha256: the payload may hold a password, and
+    without the app secret a stored fingerprint can't be used to check guesses.
+    """
+    config = current_app.config
+    secret = config.get('SECRET_KEY') or config['JWT_SECRET_KEY']
+    digest = hmac.new(secret.encode(), digestmod=hashlib.sha256)
+    digest.update(request.get_data(parse_form_data=True))  # JSON body; empty for form posts
+    for name, value in sorted(request.form.items(multi=True)):
+        digest.update(f"{name}={value}\n".encode())
+    for name, file in sorted(request.files.items(multi=True), key=lambda item: item[0]):
+        digest.update(f"{name}:{file.filename}\n".encode())
+        for chunk in iter(lambda: file.stream.read(65536), b''):
+            digest.update(chunk)
+        file.stream.seek(0)
+    return digest.hexdigest()
+
+
+def _claim(scope, key, fingerprint):
+    """
+    Returns (record, None) when this request owns the key, or (None, response)
+    when a stored or conflicting result should be sent instead.
+    """
+    config = current_app.config
+    deadline = time.monotonic() + config['IDEMPOTENCY_WAIT_SECONDS']
+    delay = 0.05
+
+    while True:
+        now = datetime.utcnow()
+        record = IdempotencyKey(
+            scope=scope,
+            key=key,
+            fingerprint=fingerprint,
+            status='pending',
+            locked_at=now,
+            expires_at=now + timedelta(hours=config['IDEMPOTENCY_TTL_HOURS']),
+        )
+        db.session.add(record)
+        try:
+            db.session.commit()
+            return record, None
+        except IntegrityError:
+            db.session.rollback()
+
+        existing = IdempotencyKey.query.filter_by(scope=scope, key=key).first()
+        if existing is None:
+            continue  # Released in the meantime, try to claim again
+        if existing.expires_at <= now:
+            db.session.delete(existing)
+            db.session.commit()
+            continue
+        if existing.fingerprint != fingerprint:
+            return None, (jsonify({"message": f"{IDEMPOTENCY_HEADER} was already used for a different request"}), 422)
+        if existing.status == 'completed':
+            return None, _replay(existing)
+
+        # Still pending. Take over if the owner looks dead, otherwise wait for it
+        stale_before = now - timedelta(seconds=config['IDEMPOTENCY_LOCK_SECONDS'])
+        if existing.locked_at <= stale_before:
+            taken = db.session.execute(
+                update(IdempotencyKey)
+                .where(IdempotencyKey.id == existing.id, IdempotencyKey.status == 'pending',
+                       IdempotencyKey.locked_at == existing.locked_at)
+                .values(locked_at=now)
+            ).rowcount
+            db.session.commit()
+            if taken:
+                return existing, None
+            continue
+
+        if time.monotonic() >= deadline:
+            return None, (jsonify({"message": "A request with this Idempotency-Key is still in progress"}), 409)
+        db.session.rollback()  # End the transaction so the next poll sees the owner's commit
+        time.sleep(delay)
+        delay = min(delay * 2, 1.0)
+
+
+def _replay(record):
+    response = make_response(record.response_body, record.status_code)
+    response.content_type = record.content_type
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _release(record_id):
+    IdempotencyKey.query.filter_by(id=record_id).delete()
+    db.session.commit()
+
+
+def purge_expired():
+    """Delete stored responses past their TTL. Returns the number removed."""
+    deleted = IdempotencyKey.query.filter(IdempotencyKey.expires_at <= datetime.utcnow()).delete()
+    db.session.commit()
+    return deleted
@@ -0,0 +1,40 @@
+"""stats counters and like timestamps
+
+Counter table behind the admin dashboard, and a timestamp on likes for the
+per-day buckets. Existing likes keep a NULL created_at and only count
+towards the totals. Run `flask rebuild-stats` once the upgrade is done.
+
+Revision ID: 457969c4191e
+Revises: b569338a492a
+Create Date: 2026-10-19 11:10:17.632412
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '457969c4191e'
+down_revision = 'b569338a492a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stat_counters',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('metric', sa.String(length=50), nullable=False),
+    sa.Column('bucket', sa.String(length=100), nullable=False),
+    sa.Column('value', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('metric', 'bucket', name='uq_stat_counters_metric_bucket')
+    )
+    with op.batch_alter_table('artwork_likes', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('created_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('artwork_likes', schema=None) as batch_op:
+        batch_op.drop_column('created_at')
+
+    op.drop_table('stat_counters')
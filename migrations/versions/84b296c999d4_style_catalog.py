@@ -0,0 +1,72 @@
+"""style catalog
+
+Style catalog with stored artwork counts, migrated from the free-form
+art.style values: each distinct value is canonicalized, gets a styles row
+and its artworks are linked to it. Same result as `flask migrate-styles`,
+which stays available to re-run the backfill.
+
+Downgrading drops the catalog but leaves art.style canonicalized.
+
+Revision ID: 84b296c999d4
+Revises: 457969c4191e
+Create Date: 2026-10-19 11:10:19.029970
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '84b296c999d4'
+down_revision = '457969c4191e'
+branch_labels = None
+depends_on = None
+
+
+def _canonical_style(value):
+    # Frozen copy of styles.canonical_style
+    return ' '.join((value or '').split()).lower()
+
+
+def upgrade():
+    styles = op.create_table('styles',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('slug', sa.String(length=100), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('artwork_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('slug')
+    )
+    with op.batch_alter_table('art', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('style_id', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_art_style'), ['style'], unique=False)
+        batch_op.create_index(batch_op.f('ix_art_style_id'), ['style_id'], unique=False)
+        batch_op.create_foreign_key('fk_art_style_id_styles', 'styles', ['style_id'], ['id'])
+
+    conn = op.get_bind()
+    art = sa.table('art', sa.column('id'), sa.column('style'), sa.column('style_id'))
+    for (raw_value,) in conn.execute(sa.select(art.c.style).distinct()).all():
+        slug = _canonical_style(raw_value)
+        if not slug:
+            continue
+        style_id = conn.execute(sa.select(styles.c.id).where(styles.c.slug == slug)).scalar()
+        if style_id is None:
+            style_id = conn.execute(
+                sa.insert(styles).values(slug=slug, name=' '.join(raw_value.split()), artwork_count=0)
+            ).inserted_primary_key[0]
+        conn.execute(sa.update(art).where(art.c.style == raw_value).values(style=slug, style_id=style_id))
+
+    artwork_count = (
+        sa.select(sa.func.count(art.c.id)).where(art.c.style_id == styles.c.id).scalar_subquery()
+    )
+    conn.execute(sa.update(styles).values(artwork_count=artwork_count))
+
+
+def downgrade():
+    with op.batch_alter_table('art', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_art_style_id_styles', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_art_style_id'))
+        batch_op.drop_index(batch_op.f('ix_art_style'))
+        batch_op.drop_column('style_id')
+
+    op.drop_table('styles')
@@ -0,0 +1,50 @@
+"""similar artworks
+
+Precomputed similar artworks, the watermark of the job that refreshes
+them, and indexes on the like columns it and the like routes filter on.
+Run `flask refresh-similar --full` once the upgrade is done.
+
+Revision ID: 8ba951ec7e43
+Revises: 84b296c999d4
+Create Date: 2026-10-19 11:10:20.414716
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8ba951ec7e43'
+down_revision = '84b296c999d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('similar_artworks',
+    sa.Column('artwork_id', sa.Integer(), nullable=False),
+    sa.Column('rank', sa.Integer(), nullable=False),
+    sa.Column('similar_artwork_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['artwork_id'], ['art.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['similar_artwork_id'], ['art.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('artwork_id', 'rank')
+    )
+    op.create_table('job_state',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('last_id', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+    with op.batch_alter_table('artwork_likes', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_artwork_likes_artwork_id'), ['artwork_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_artwork_likes_user_id'), ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('artwork_likes', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_artwork_likes_user_id'))
+        batch_op.drop_index(batch_op.f('ix_artwork_likes_artwork_id'))
+
+    op.drop_table('job_state')
+    op.drop_table('similar_artworks')
@@ -0,0 +1,50 @@
+"""contact archive
+
+Archive table for old contact messages, and indexes on the contact columns
+the archive job and the user's contact list filter on.
+
+Revision ID: deab6e2fefe1
+Revises: 287ff1eb93d0
+Create Date: 2026-10-19 11:10:23.058960
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'deab6e2fefe1'
+down_revision = '287ff1eb93d0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('contact_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('email', sa.String(length=100), nullable=False),
+    sa.Column('message', sa.Text(), nullable=False),
+    sa.Column('posted_at', sa.DateTime(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('contact_archive', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_contact_archive_email'), ['email'], unique=False)
+        batch_op.create_index(batch_op.f('ix_contact_archive_posted_at'), ['posted_at'], unique=False)
+
+    with op.batch_alter_table('contact', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_contact_email'), ['email'], unique=False)
+        batch_op.create_index(batch_op.f('ix_contact_posted_at'), ['posted_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('contact', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_contact_posted_at'))
+        batch_op.drop_index(batch_op.f('ix_contact_email'))
+
+    with op.batch_alter_table('contact_archive', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_contact_archive_posted_at'))
+        batch_op.drop_index(batch_op.f('ix_contact_archive_email'))
+
+    op.drop_table('contact_archive')
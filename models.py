@@ -36,7 +36,8 @@ class Artwork(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False, unique=False)
     email = db.Column(db.String(80), nullable=False, unique=False)
-    style = db.Column(db.String(100), nullable=False)
+    style = db.Column(db.String(100), nullable=False, index=True)  # Canonical slug, see styles.canonical_style
+    style_id = db.Column(db.Integer, db.ForeignKey('styles.id'), nullable=True, index=True)
     image_url = db.Column(db.String(500), nullable=False)
     description = db.Column(db.Text, nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
@@ -57,11 +58,31 @@ class Artwork(db.Model):
             "user_id": self.user_id
         }
 
+class Style(db.Model):
+    """Catalog of artwork styles with an incrementally maintained artwork count."""
+    __tablename__ = 'styles'
+    id = db.Column(db.Integer, primary_key=True)
+    slug = db.Column(db.String(100), unique=True, nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    artwork_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<Style {self.slug}>"
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'slug': self.slug,
+            'name': self.name,
+            'artwork_count': self.artwork_count,
+        }
+
 class ArtworkLike(db.Model):
     __tablename__ = 'artwork_likes'
     id = db.Column(db.Integer, primary_key=True)
-    artwork_id = db.Column(db.Integer, db.ForeignKey('art.id'), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    artwork_id = db.Column(db.Integer, db.ForeignKey('art.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     # artwork = db.relationship('Artwork', backref=db.backref('likes', lazy=True))
     artwork = db.relationship('Artwork', back_populates='likes')
@@ -77,13 +98,66 @@ class ArtworkLike(db.Model):
         }
 
 
+class SimilarArtwork(db.Model):
+    """Precomputed top-K co-like neighbours of an artwork (see recommendations.py)."""
+    __tablename__ = 'similar_artworks'
+    artwork_id = db.Column(db.Integer, db.ForeignKey('art.id', ondelete='CASCADE'), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    similar_artwork_id = db.Column(db.Integer, db.ForeignKey('art.id', ondelete='CASCADE'), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+
+    similar_artwork = db.relationship('Artwork', foreign_keys=[similar_artwork_id])
+
+    def __repr__(self):
+        return f"<SimilarArtwork {self.artwork_id}->{self.similar_artwork_id} ({self.score:.3f})>"
+
+    def to_dict(self):
+        return {
+            "artwork_id": self.artwork_id,
+            "similar_artwork_id": self.similar_artwork_id,
+            "score": self.score,
+            "rank": self.rank,
+        }
+
+
+class JobState(db.Model):
+    """Watermarks for background jobs, e.g. the last like id processed."""
+    __tablename__ = 'job_state'
+    name = db.Column(db.String(50), primary_key=True)
+    last_id = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<JobState {self.name}={self.last_id}>"
+
+
+class IdempotencyKey(db.Model):
+    """Stored outcome of a POST sent with an `Idempotency-Key` header (see idempotency.py)."""
+    __tablename__ = 'idempotency_keys'
+    __table_args__ = (db.UniqueConstraint('scope', 'key', name='uq_idempotency_keys_scope_key'),)
+    id = db.Column(db.Integer, primary_key=True)
+    scope = db.Column(db.String(100), nullable=False)  # Endpoint, plus user id when authenticated
+    key = db.Column(db.String(255), nullable=False)
+    fingerprint = db.Column(db.String(64), nullable=False)  # HMAC-sha256 of the request payload
+    status = db.Column(db.String(20), nullable=False, default='pending')  # 'pending' or 'completed'
+    status_code = db.Column(db.Integer, nullable=True)
+    response_body = db.Column(db.Text, nullable=True)
+    content_type = db.Column(db.String(100), nullable=True)
+    locked_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<IdempotencyKey {self.scope}:{self.key} {self.status}>"
+
+
 class Contact(db.Model):
     __tablename__='contact'
     id=db.Column(db.Integer, primary_key=True)
     name=db.Column(db.String(100), nullable=False, unique=False)
-    email=db.Column(db.String(100), nullable=False)
+    email=db.Column(db.String(100), nullable=False, index=True)
     message=db.Column(db.Text, nullable=False)
-    posted_at = db.Column(db.DateTime, default=datetime.utcnow)
+    posted_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
     def __repr__(self):
         return f"<Contact {self.name}>"
@@ -97,6 +171,29 @@ class Contact(db.Model):
             'posted_at':self.posted_at.strftime('%d-%m-%Y %H:%M:%S'),
         }
     
+class ArchivedContact(db.Model):
+    """Contact messages moved out of the hot table by `flask archive-contacts` (ids are kept)."""
+    __tablename__ = 'contact_archive'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(100), nullable=False)
+    email = db.Column(db.String(100), nullable=False, index=True)
+    message = db.Column(db.Text, nullable=False)
+    posted_at = db.Column(db.DateTime, index=True)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ArchivedContact {self.name}>"
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'email': self.email,
+            'message': self.message,
+            'posted_at': self.posted_at.strftime('%d-%m-%Y %H:%M:%S') if self.posted_at else None,
+            'archived_at': self.archived_at.strftime('%d-%m-%Y %H:%M:%S'),
+        }
+    
 class Admin(db.Model):
     __tablename__ = 'admins'
     id = db.Column(db.Integer, primary_key=True)
@@ -123,3 +220,29 @@ class Admin(db.Model):
             'role': self.role,
             'created_at': self.created_at.isoformat(),
         }
+
+
+class StatCounter(db.Model):
+    """Pre-aggregated counters backing the admin dashboard.
+
+    Each row is one (metric, bucket) pair, e.g. ('artworks_by_style', 'animated')
+    or ('likes_per_day', '2024-11-30'). Rows are bumped in the same transaction
+    as the write they describe, so reading the dashboard never scans the
+    underlying tables.
+    """
+    __tablename__ = 'stat_counters'
+    __table_args__ = (db.UniqueConstraint('metric', 'bucket', name='uq_stat_counters_metric_bucket'),)
+    id = db.Column(db.Integer, primary_key=True)
+    metric = db.Column(db.String(50), nullable=False)
+    bucket = db.Column(db.String(100), nullable=False)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<StatCounter {self.metric}:{self.bucket}={self.value}>"
+
+    def to_dict(self):
+        return {
+            'metric': self.metric,
+            'bucket': self.bucket,
+            'value': self.value,
+        }
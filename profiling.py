@@ -0,0 +1,173 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import re
+import time
+import uuid
+from datetime import datetime
+from flask import g, request, has_request_context
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+PROFILE_HEADER = 'X-Profile'
+MAX_SQL_STATEMENTS = 500
+PROFILE_ID_RE = re.compile(r'^[0-9]{8}T[0-9]{12}-[0-9a-f]{8}$')
+
+
+def init_profiling(app):
+    """
+    Opt-in request profiling.
+
+    A request is profiled when an admin sends `X-Profile: 1` or when it is
+    picked by PROFILE_SAMPLE_RATE (0.0-1.0). The cProfile dump, route and SQL
+    statements are written to PROFILE_DIR, which keeps at most
+    PROFILE_MAX_FILES profiles (oldest are deleted first).
+    """
+    app.config.setdefault('PROFILE_SAMPLE_RATE', 0.0)
+    app.config.setdefault('PROFILE_DIR', '/tmp/profiles')
+    app.config.setdefault('PROFILE_MAX_FILES', 50)
+
+    @app.before_request
+    def start_profile():
+        if not _should_profile(app):
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active on this thread
+            return
+        g._profile = {
+            'profiler': profiler,
+            'started': time.perf_counter(),
+            'sql': [],
+        }
+
+    @app.after_request
+    def finish_profile(response):
+        profile = g.pop('_profile', None)
+        if profile is None:
+            return response
+        profile['profiler'].disable()
+        try:
+            profile_id = _save_profile(app, profile, response.status_code)
+            response.headers['X-Profile-Id'] = profile_id
+        except OSError as e:
+            app.logger.warning(f"Could not save request profile: {e}")
+        return response
+
+
+def _should_profile(app):
+    if request.headers.get(PROFILE_HEADER) == '1':
+        try:
+            verify_jwt_in_request(optional=True)
+            identity = get_jwt_identity()
+        except Exception:
+            identity = None
+        if identity and identity.get('role') == 'admin':
+            return True
+    rate = app.config['PROFILE_SAMPLE_RATE']
+    return rate > 0 and random.random() < rate
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and '_profile' in g:
+        conn.info.setdefault('_profile_query_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not (has_request_context() and '_profile' in g):
+        return
+    starts = conn.info.get('_profile_query_start')
+    if not starts:
+        return
+    duration = time.perf_counter() - starts.pop()
+    statements = g._profile['sql']
+    if len(statements) < MAX_SQL_STATEMENTS:
+        statements.append({'statement': statement, 'duration_ms': round(duration * 1000, 3)})
+
+
+def _save_profile(app, profile, status_code):
+    directory = app.config['PROFILE_DIR']
+    os.makedirs(directory, exist_ok=True)
+
+    profile_id = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}-{uuid.uuid4().hex[:8]}"
+    duration = time.perf_counter() - profile['started']
+
+    summary = io.StringIO()
+    stats = pstats.Stats(profile['profiler'], stream=summary)
+    stats.sort_stats('cumulative').print_stats(30)
+    stats.dump_stats(os.path.join(directory, f"{profile_id}.prof"))
+
+    sql = profile['sql']
+    metadata = {
+        'id': profile_id,
+        'method': request.method,
+        'path': request.path,
+        'route': request.url_rule.rule if request.url_rule else None,
+        'endpoint': request.endpoint,
+        'status': status_code,
+        'duration_ms': round(duration * 1000, 3),
+        'sql_count': len(sql),
+        'sql_ms': round(sum(q['duration_ms'] for q in sql), 3),
+        'sql': sql,
+        'summary': summary.getvalue(),
+        'captured_at': datetime.utcnow().isoformat(),
+        'pid': os.getpid(),
+    }
+    with open(os.path.join(directory, f"{profile_id}.json"), 'w') as f:
+        json.dump(metadata, f)
+
+    _prune(directory, app.config['PROFILE_MAX_FILES'])
+    return profile_id
+
+
+def _prune(directory, max_files):
+    """Drop the oldest profiles so the directory behaves as a ring buffer."""
+    ids = sorted(name[:-5] for name in os.listdir(directory) if name.endswith('.json'))
+    for profile_id in ids[:-max_files] if max_files > 0 else ids:
+        for ext in ('.json', '.prof'):
+            try:
+                os.remove(os.path.join(directory, profile_id + ext))
+            except FileNotFoundError:
+                pass  # Pruned by another worker
+
+
+def list_profiles(directory):
+    """Metadata (without SQL/summary bodies) for stored profiles, newest first."""
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        if not name.endswith('.json'):
+            continue
+        metadata = load_profile(directory, name[:-5])
+        if metadata:
+            metadata.pop('sql', None)
+            metadata.pop('summary', None)
+            profiles.append(metadata)
+    return profiles
+
+
+def load_profile(directory, profile_id):
+    if not PROFILE_ID_RE.match(profile_id):
+        return None
+    try:
+        with open(os.path.join(directory, f"{profile_id}.json")) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def profile_dump_path(directory, profile_id):
+    """Path of the raw cProfile dump (loadable with pstats/snakeviz), or None."""
+    if not PROFILE_ID_RE.match(profile_id):
+        return None
+    path = os.path.join(directory, f"{profile_id}.prof")
+    return path if os.path.exists(path) else None
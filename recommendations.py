@@ -0,0 +1,220 @@
+"""
+Item-to-item "similar artworks" from the like matrix.
+
+Likes form a binary user x artwork matrix X. The co-like counts of every
+artwork pair are X.T @ X and cosine similarity divides those by
+sqrt(likes_i * likes_j). For each artwork we keep the top K neighbours in
+the similar_artworks table so the API serves them with one indexed lookup.
+
+Run with `flask refresh-similar` (incremental) or `--full` (nightly).
+"""
+import itertools
+import numpy as np
+import scipy.sparse as sp
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete, insert, func, or_
+from models import db, ArtworkLike, SimilarArtwork, JobState
+
+JOB_NAME = 'similar_artworks'
+DEFAULT_K = 20
+LOAD_CHUNK = 500_000
+WRITE_CHUNK = 10_000
+# The watermark only advances past likes at least this old, so a like whose
+# transaction commits after a higher id was read is still picked up
+WATERMARK_LAG = timedelta(minutes=5)
+
+
+def top_k_similar(user_ids, artwork_ids, k=DEFAULT_K, targets=None, block_size=1024, like_counts=None):
+    """
+    Top-K cosine neighbours from parallel arrays of (user_id, artwork_id) likes.
+
+    `targets` limits which artworks get their neighbours recomputed (all by
+    default). Rows are processed in blocks of `block_size` artworks to bound
+    memory. Returns (artwork_id, similar_artwork_id, score, rank) arrays.
+
+    When the likes are only a subset (every like of the users who liked a
+    target), pass `like_counts=(artwork_ids, counts)` with the global number
+    of distinct likers per artwork so the cosine norms stay exact.
+    """
+    empty = (np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.float64), np.empty(0, np.int64))
+    if len(artwork_ids) == 0:
+        return empty
+
+    items, item_idx = np.unique(np.asarray(artwork_ids), return_inverse=True)
+    _, user_idx = np.unique(np.asarray(user_ids), return_inverse=True)
+    X = sp.csr_matrix(
+        (np.ones(len(item_idx), dtype=np.float32), (user_idx, item_idx)),
+        shape=(user_idx.max() + 1, len(items)),
+    )
+    X.sum_duplicates()
+    X.data[:] = 1  # A repeated (user, artwork) pair is still one like
+    Xt = X.T.tocsr()
+
+    if like_counts is None:
+        counts = np.diff(Xt.indptr).astype(np.float64)
+    else:
+        count_ids, count_values = (np.asarray(a) for a in like_counts)
+        order = np.argsort(count_ids)
+        count_ids, count_values = count_ids[order], count_values[order]
+        position = np.clip(np.searchsorted(count_ids, items), 0, len(count_ids) - 1)
+        known = count_ids[position] == items
+        # Fall back to the subset's own count for artworks missing from like_counts
+        counts = np.where(known, count_values[position], np.diff(Xt.indptr)).astype(np.float64)
+    inv_norms = 1.0 / np.sqrt(counts)
+
+    if targets is None:
+        rows = np.arange(len(items))
+    else:
+        rows = np.flatnonzero(np.isin(items, np.asarray(list(targets))))
+
+    src, dst, scores, ranks = [], [], [], []
+    for start in range(0, len(rows), block_size):
+        block = rows[start:start + block_size]
+        S = (Xt[block] @ X).tocsr()  # co-like counts, block x items
+        S.sort_indices()
+
+        row_of_entry = np.repeat(np.arange(len(block)), np.diff(S.indptr))
+        data = S.data.astype(np.float64) * inv_norms[block][row_of_entry] * inv_norms[S.indices]
+        data[S.indices == block[row_of_entry]] = 0.0  # An artwork is not its own neighbour
+
+        for i, item in enumerate(block):
+            lo, hi = S.indptr[i], S.indptr[i + 1]
+            row_scores = data[lo:hi]
+            row_items = S.indices[lo:hi]
+            keep = row_scores > 0
+            row_scores, row_items = row_scores[keep], row_items[keep]
+            if len(row_scores) == 0:
+                continue
+            if len(row_scores) > k:
+                # Keep everything tied with the k-th score so the id tie-break below decides
+                kth_score = -np.partition(-row_scores, k - 1)[k - 1]
+                top = row_scores >= kth_score
+                row_scores, row_items = row_scores[top], row_items[top]
+            # Highest score first, ties broken by artwork id for stable output
+            order = np.lexsort((items[row_items], -row_scores))[:k]
+            src.append(np.full(len(order), items[item]))
+            dst.append(items[row_items[order]])
+            scores.append(row_scores[order])
+            ranks.append(np.arange(1, len(order) + 1))
+
+    if not src:
+        return empty
+    return np.concatenate(src), np.concatenate(dst), np.concatenate(scores), np.concatenate(ranks)
+
+
+def load_likes(users=None):
+    """
+    Stream (user_id, artwork_id) pairs from the database into numpy arrays.
+
+    `users` is an optional subquery of user ids to restrict the load to.
+    """
+    query = select(ArtworkLike.user_id, ArtworkLike.artwork_id)
+    if users is not None:
+        query = query.where(ArtworkLike.user_id.in_(users))
+    result = db.session.execute(query.execution_options(yield_per=LOAD_CHUNK))
+    parts = [
+        np.fromiter(itertools.chain.from_iterable(part), dtype=np.int64, count=2 * len(part)).reshape(-1, 2)
+        for part in result.partitions()
+    ]
+    if not parts:
+        return np.empty(0, np.int64), np.empty(0, np.int64)
+    pairs = np.concatenate(parts)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def load_like_counts(users):
+    """Distinct likers per artwork, for every artwork liked by `users` (one aggregate query)."""
+    rows = db.session.execute(
+        select(ArtworkLike.artwork_id, func.count(func.distinct(ArtworkLike.user_id)))
+        .where(ArtworkLike.artwork_id.in_(select(ArtworkLike.artwork_id).where(ArtworkLike.user_id.in_(users))))
+        .group_by(ArtworkLike.artwork_id)
+    ).all()
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    counts = np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows))
+    return ids, counts
+
+
+def _new_likers(since_id):
+    return select(ArtworkLike.user_id).where(ArtworkLike.id > since_id).distinct()
+
+
+def _touched_artworks(since_id):
+    """
+    Artworks whose neighbour lists change because of likes with id > since_id:
+    the newly liked artworks plus everything else their new likers have liked
+    (those pairs gained a co-like).
+    """
+    return {
+        row[0] for row in db.session.execute(
+            select(ArtworkLike.artwork_id).where(ArtworkLike.user_id.in_(_new_likers(since_id))).distinct()
+        )
+    }
+
+
+def _targets_likers(since_id):
+    """Users who liked any touched artwork: their likes are all a touched row needs."""
+    touched = select(ArtworkLike.artwork_id).where(ArtworkLike.user_id.in_(_new_likers(since_id)))
+    return select(ArtworkLike.user_id).where(ArtworkLike.artwork_id.in_(touched)).distinct()
+
+
+def refresh(full=False, k=DEFAULT_K):
+    """
+    Recompute similar artworks.
+
+    Incremental runs only recompute artworks touched by likes newer than the
+    stored watermark, and only load the likes of users who liked one of
+    them. Unlikes and the small drift in other artworks' scores are picked
+    up by the next full run. Returns the number of artworks recomputed.
+
+    The watermark trails the newest like by WATERMARK_LAG, so recent likes
+    are looked at again on the next run. That covers transactions that
+    commit a lower id after a higher one was already read.
+    """
+    state = db.session.get(JobState, JOB_NAME)
+    if state is None:
+        state = JobState(name=JOB_NAME, last_id=0)
+        db.session.add(state)
+        full = True
+
+    since_id = state.last_id
+    settled_before = datetime.utcnow() - WATERMARK_LAG
+    watermark = db.session.query(func.max(ArtworkLike.id)).filter(
+        ArtworkLike.id > since_id,
+        or_(ArtworkLike.created_at.is_(None), ArtworkLike.created_at < settled_before),
+    ).scalar() or since_id
+
+    if full:
+        targets = None
+        user_ids, artwork_ids = load_likes()
+        src, dst, scores, ranks = top_k_similar(user_ids, artwork_ids, k=k)
+    else:
+        targets = _touched_artworks(since_id)
+        if not targets:
+            state.last_id = watermark
+            db.session.commit()
+            return 0
+        likers = _targets_likers(since_id)
+        user_ids, artwork_ids = load_likes(users=likers)
+        src, dst, scores, ranks = top_k_similar(
+            user_ids, artwork_ids, k=k, targets=targets, like_counts=load_like_counts(likers)
+        )
+
+    if targets is None:
+        db.session.execute(delete(SimilarArtwork))
+    else:
+        target_list = sorted(targets)
+        for start in range(0, len(target_list), WRITE_CHUNK):
+            chunk = target_list[start:start + WRITE_CHUNK]
+            db.session.execute(delete(SimilarArtwork).where(SimilarArtwork.artwork_id.in_(chunk)))
+
+    for start in range(0, len(src), WRITE_CHUNK):
+        end = start + WRITE_CHUNK
+        db.session.execute(insert(SimilarArtwork), [
+            {"artwork_id": int(a), "similar_artwork_id": int(b), "score": float(s), "rank": int(r)}
+            for a, b, s, r in zip(src[start:end], dst[start:end], scores[start:end], ranks[start:end])
+        ])
+
+    state.last_id = watermark
+    state.updated_at = datetime.utcnow()
+    db.session.commit()
+    return len(np.unique(src)) if targets is None else len(targets)
@@ -0,0 +1,225 @@
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+
+
+class OutboundUnavailable(Exception):
+    """The provider was not called, or did not answer in time."""
+
+    def __init__(self, provider, message, retry_after=None):
+        super().__init__(f"{provider}: {message}")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(OutboundUnavailable):
+    pass
+
+
+class BulkheadFullError(OutboundUnavailable):
+    pass
+
+
+class OutboundTimeoutError(OutboundUnavailable):
+    pass
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failures.
+    open -> half_open once `reset_timeout` seconds have passed; a single
+    probe call is let through. A successful probe closes the circuit and a
+    failed one opens it again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Returns True if a call may go out now."""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                self._probing = False
+            if self.state == 'half_open' and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def retry_after(self):
+        if self.opened_at is None:
+            return None
+        return max(1, math.ceil(self.reset_timeout - (time.monotonic() - self.opened_at)))
+
+    def cancel_probe(self):
+        """The allowed call never went out, let the next one probe instead."""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+
+class OutboundClient:
+    """
+    Wraps calls to one external provider (Cloudinary, SendGrid) with:
+
+    - a hard timeout: the call runs on a small thread pool and the caller
+      stops waiting after `timeout` seconds;
+    - a bulkhead: at most `max_concurrent` calls in flight. A slot is only
+      freed when the underlying call really returns, so a hung provider
+      cannot tie up more than its share of the worker;
+    - a circuit breaker that fails fast while the provider is down;
+    - counters for the admin metrics endpoint.
+
+    Exceptions listed in `ignore` (e.g. a 400 for a bad file) are re-raised
+    without counting against the breaker.
+    """
+
+    def __init__(self, name, target, timeout=10.0, max_concurrent=4,
+                 failure_threshold=5, reset_timeout=30.0, ignore=()):
+        self.name = name
+        self.target = target
+        self.timeout = timeout
+        self.max_concurrent = max_concurrent
+        self.ignore = tuple(ignore)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix=f"outbound-{name}")
+        self._lock = threading.Lock()
+        self._metrics = {
+            'calls': 0,
+            'successes': 0,
+            'failures': 0,
+            'client_errors': 0,
+            'timeouts': 0,
+            'short_circuited': 0,
+            'bulkhead_rejected': 0,
+            'in_flight': 0,
+            'latency_ms_total': 0.0,
+            'latency_ms_max': 0.0,
+        }
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._metrics[name] += amount
+
+    def call(self, *args, **kwargs):
+        self._count('calls')
+        if not self.breaker.allow():
+            self._count('short_circuited')
+            raise CircuitOpenError(self.name, "circuit open", retry_after=self.breaker.retry_after())
+        if not self._slots.acquire(blocking=False):
+            self._count('bulkhead_rejected')
+            self.breaker.cancel_probe()
+            raise BulkheadFullError(self.name, "too many concurrent calls")
+
+        self._count('in_flight')
+        started = time.perf_counter()
+        future = self._executor.submit(self.target, *args, **kwargs)
+        future.add_done_callback(self._release)
+        try:
+            result = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            self._count('timeouts')
+            self.breaker.record_failure()
+            raise OutboundTimeoutError(self.name, f"no response after {self.timeout}s")
+        except self.ignore:
+            self._count('client_errors')
+            self.breaker.record_success()
+            raise
+        except Exception:
+            self._count('failures')
+            self.breaker.record_failure()
+            raise
+        finally:
+            self._record_latency(time.perf_counter() - started)
+
+        self._count('successes')
+        self.breaker.record_success()
+        return result
+
+    __call__ = call
+
+    def _release(self, future):
+        self._count('in_flight', -1)
+        self._slots.release()
+
+    def _record_latency(self, seconds):
+        latency_ms = seconds * 1000
+        with self._lock:
+            self._metrics['latency_ms_total'] += latency_ms
+            self._metrics['latency_ms_max'] = max(self._metrics['latency_ms_max'], latency_ms)
+
+    def metrics(self):
+        with self._lock:
+            metrics = dict(self._metrics)
+        completed = metrics['successes'] + metrics['failures'] + metrics['client_errors'] + metrics['timeouts']
+        latency_ms_total = metrics.pop('latency_ms_total')
+        metrics['latency_ms_avg'] = round(latency_ms_total / completed, 3) if completed else 0.0
+        metrics['latency_ms_max'] = round(metrics['latency_ms_max'], 3)
+        metrics.update({
+            'state': self.breaker.state,
+            'consecutive_failures': self.breaker.failures,
+            'timeout': self.timeout,
+            'max_concurrent': self.max_concurrent,
+        })
+        return metrics
+
+    @contextmanager
+    def override(self, target):
+        """Temporarily swap the provider, e.g. for a FakeProvider in tests."""
+        original, self.target = self.target, target
+        try:
+            yield target
+        finally:
+            self.target = original
+
+
+class FakeProvider:
+    """
+    Test double for an outbound provider.
+
+    Sleeps `latency` seconds, then raises `error` (on every call, or every
+    `fail_every`-th call) or returns `result`.
+    """
+
+    def __init__(self, result=None, latency=0.0, error=None, fail_every=0):
+        self.result = result
+        self.latency = latency
+        self.error = error
+        self.fail_every = fail_every
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs):
+        with self._lock:
+            self.calls += 1
+            call_number = self.calls
+        if self.latency:
+            time.sleep(self.latency)
+        if self.error is not None and (not self.fail_every or call_number % self.fail_every == 0):
+            raise self.error
+        return self.result(*args, **kwargs) if callable(self.result) else self.result
@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 
 from models import db, User, Artwork, Contact
+import stats
 from flask import Flask
+from flask_migrate import Migrate, stamp
 from werkzeug.security import generate_password_hash
 import os
 from dotenv import load_dotenv
@@ -11,11 +13,14 @@ app = Flask(__name__)
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db.init_app(app)
+migrate = Migrate(app, db)
 
 with app.app_context():
     # Drop all tables and recreate them to ensure a clean slate
     db.drop_all()
     db.create_all()
+    # create_all() built the latest schema, so `flask db upgrade` has nothing left to do
+    stamp()
 
     # Seed Users
     user1 = User(username="john_doe", email="john@example.com")
@@ -190,4 +195,7 @@ with app.app_context():
     # Commit all data to the database
     db.session.commit()
 
+    # Link seeded artworks to the style catalog and build the dashboard counters
+    stats.rebuild()
+
     print("Database seeded with users, artworks, and contacts successfully!")
@@ -0,0 +1,149 @@
+from datetime import datetime, timedelta
+from sqlalchemy import update, func
+from sqlalchemy.exc import IntegrityError
+from models import db, User, Artwork, ArtworkLike, Contact, ArchivedContact, StatCounter
+import styles
+
+# Metric names stored in StatCounter.metric
+TOTALS = 'totals'
+ARTWORKS_BY_STYLE = 'artworks_by_style'  # Served from Style.artwork_count, not stored here
+USERS_PER_DAY = 'users_per_day'
+LIKES_PER_DAY = 'likes_per_day'
+CONTACTS_PER_DAY = 'contacts_per_day'
+
+PER_DAY_METRICS = (USERS_PER_DAY, LIKES_PER_DAY, CONTACTS_PER_DAY)
+
+
+def _bump_day(metric, value, delta):
+    """
+    Bump the per-day bucket of a timestamp ('YYYY-MM-DD').
+
+    Rows that predate the timestamp column have NULL there; like rebuild(),
+    they only count towards the totals.
+    """
+    if value is not None:
+        bump(metric, value.strftime('%Y-%m-%d'), delta)
+
+
+def bump(metric, bucket, delta=1):
+    """
+    Add `delta` to a counter inside the current transaction.
+
+    Uses an atomic `value = value + delta` update so concurrent workers
+    don't lose increments; the row is created on first use.
+    """
+    stmt = (
+        update(StatCounter)
+        .where(StatCounter.metric == metric, StatCounter.bucket == bucket)
+        .values(value=StatCounter.value + delta)
+        .execution_options(synchronize_session=False)
+    )
+    if db.session.execute(stmt).rowcount:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(StatCounter(metric=metric, bucket=bucket, value=delta))
+    except IntegrityError:
+        # Another worker created the row first, retry the increment
+        db.session.execute(stmt)
+
+
+# Hooks called by the routes before they commit. Objects are flushed first
+# so column defaults such as created_at are populated.
+def record_user(user, delta=1):
+    db.session.flush()
+    bump(TOTALS, 'users', delta)
+    _bump_day(USERS_PER_DAY, user.created_at, delta)
+
+
+def record_artwork(artwork, delta=1):
+    bump(TOTALS, 'artworks', delta)
+
+
+def record_like(like, delta=1):
+    db.session.flush()
+    bump(TOTALS, 'likes', delta)
+    _bump_day(LIKES_PER_DAY, like.created_at, delta)
+
+
+def record_contact(contact, delta=1):
+    db.session.flush()
+    bump(TOTALS, 'contacts', delta)
+    _bump_day(CONTACTS_PER_DAY, contact.posted_at, delta)
+
+
+def record_artwork_deleted(artwork):
+    """Remove an artwork and the likes that cascade with it from the counters."""
+    record_artwork(artwork, -1)
+    likes_by_day = (
+        db.session.query(func.date(ArtworkLike.created_at), func.count(ArtworkLike.id))
+        .filter(ArtworkLike.artwork_id == artwork.id)
+        .group_by(func.date(ArtworkLike.created_at))
+        .all()
+    )
+    for day, count in likes_by_day:
+        bump(TOTALS, 'likes', -count)
+        if day is not None:
+            bump(LIKES_PER_DAY, str(day), -count)
+
+
+def get_dashboard(days=30):
+    """
+    Read the dashboard from the counter table.
+
+    Cost depends only on the number of counter rows (styles + days in the
+    window), never on the size of the users/art/likes/contact tables.
+    """
+    since = (datetime.utcnow() - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+    counters = StatCounter.query.filter(
+        db.or_(
+            StatCounter.metric == TOTALS,
+            db.and_(StatCounter.metric.in_(PER_DAY_METRICS), StatCounter.bucket >= since),
+        )
+    ).all()
+
+    dashboard = {
+        TOTALS: {'users': 0, 'artworks': 0, 'likes': 0, 'contacts': 0},
+        ARTWORKS_BY_STYLE: {style.slug: style.artwork_count for style in styles.list_styles()},
+        USERS_PER_DAY: {},
+        LIKES_PER_DAY: {},
+        CONTACTS_PER_DAY: {},
+    }
+    for counter in counters:
+        if counter.value or counter.metric == TOTALS:
+            dashboard[counter.metric][counter.bucket] = counter.value
+    return dashboard
+
+
+def rebuild():
+    """Recompute every counter from the source tables (full scan)."""
+    # Artworks per style live on the catalog; recount them there
+    styles.backfill()
+    StatCounter.query.delete()
+
+    totals = {
+        'users': User.query.count(),
+        'artworks': Artwork.query.count(),
+        'likes': ArtworkLike.query.count(),
+        # Archived contacts still count towards the dashboard history
+        'contacts': Contact.query.count() + ArchivedContact.query.count(),
+    }
+    rows = [StatCounter(metric=TOTALS, bucket=name, value=value) for name, value in totals.items()]
+
+    per_day = (
+        (USERS_PER_DAY, User.created_at, User.id),
+        (LIKES_PER_DAY, ArtworkLike.created_at, ArtworkLike.id),
+        (CONTACTS_PER_DAY, Contact.posted_at, Contact.id),
+        (CONTACTS_PER_DAY, ArchivedContact.posted_at, ArchivedContact.id),
+    )
+    day_counts = {}
+    for metric, column, key in per_day:
+        for day, count in db.session.query(func.date(column), func.count(key)).group_by(func.date(column)):
+            if day is not None:
+                day_counts[(metric, str(day))] = day_counts.get((metric, str(day)), 0) + count
+    for (metric, day), count in day_counts.items():
+        rows.append(StatCounter(metric=metric, bucket=day, value=count))
+
+    db.session.add_all(rows)
+    db.session.commit()
+    return totals
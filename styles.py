@@ -0,0 +1,82 @@
+from sqlalchemy import update, func
+from sqlalchemy.exc import IntegrityError
+from models import db, Artwork, Style
+
+
+def canonical_style(value):
+    """'  Animated ' -> 'animated', 'Pop  Art' -> 'pop art'."""
+    return ' '.join((value or '').split()).lower()
+
+
+def get_or_create_style(raw_value):
+    """Returns the catalog entry for a style, creating it inside the current transaction."""
+    slug = canonical_style(raw_value)
+    style = Style.query.filter_by(slug=slug).first()
+    if style:
+        return style
+    try:
+        with db.session.begin_nested():
+            style = Style(slug=slug, name=' '.join(raw_value.split()), artwork_count=0)
+            db.session.add(style)
+    except IntegrityError:
+        # Created concurrently by another worker
+        style = Style.query.filter_by(slug=slug).first()
+    return style
+
+
+def adjust_count(style_id, delta):
+    """Atomically move a style's artwork count, in the current transaction."""
+    if style_id is None:
+        return
+    db.session.execute(
+        update(Style)
+        .where(Style.id == style_id)
+        .values(artwork_count=Style.artwork_count + delta)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def assign_style(artwork, raw_value):
+    """Canonicalize an artwork's style, link it to the catalog and count it."""
+    style = get_or_create_style(raw_value)
+    artwork.style = style.slug
+    artwork.style_id = style.id
+    adjust_count(style.id, 1)
+    return style
+
+
+def list_styles():
+    """Catalog ordered by popularity; reads the stored counts, no GROUP BY over art."""
+    return (
+        Style.query.filter(Style.artwork_count > 0)
+        .order_by(Style.artwork_count.desc(), Style.slug)
+        .all()
+    )
+
+
+def backfill():
+    """
+    Migrate existing free-form Artwork.style values into the catalog.
+
+    Canonicalizes every distinct value, links artworks to their Style row
+    and recomputes the stored counts. Safe to run more than once.
+    """
+    raw_values = [row[0] for row in db.session.query(Artwork.style).distinct()]
+    for raw_value in raw_values:
+        if not canonical_style(raw_value):
+            continue
+        style = get_or_create_style(raw_value)
+        db.session.execute(
+            update(Artwork)
+            .where(Artwork.style == raw_value)
+            .values(style=style.slug, style_id=style.id)
+            .execution_options(synchronize_session=False)
+        )
+
+    counts = dict(
+        db.session.query(Artwork.style_id, func.count(Artwork.id)).group_by(Artwork.style_id).all()
+    )
+    for style in Style.query.all():
+        style.artwork_count = counts.get(style.id, 0)
+    db.session.commit()
+    return len(raw_values)
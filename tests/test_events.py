@@ -0,0 +1,61 @@
+import pytest
+from events import EventHub
+
+
+@pytest.fixture
+def hub(tmp_path):
+    hub = EventHub(str(tmp_path / 'events.db'), buffer_size=3, poll_interval=0.05)
+    for artwork_id in range(1, 7):
+        hub.publish('like', artwork_id=artwork_id, style='animated' if artwork_id == 5 else 'digital')
+    return hub
+
+
+def drain(subscriber):
+    events = []
+    while not subscriber.queue.empty():
+        events.append(subscriber.queue.get_nowait())
+    return events
+
+
+def test_filtered_replay_reaches_past_the_buffer(hub):
+    subscriber = hub.subscribe(artwork_ids=[5], last_event_id=0)
+
+    assert [event['artwork_id'] for event in drain(subscriber)] == [5]
+    assert not subscriber.needs_resync()
+
+
+def test_replay_stops_where_live_delivery_starts(hub):
+    live = hub.subscribe(styles=['animated'])
+    assert drain(live) == []  # Without Last-Event-ID only new events are delivered
+
+    replayed = hub.subscribe(styles=['animated'], last_event_id=2)
+    assert [event['id'] for event in drain(replayed)] == [5]
+
+
+def test_replay_overflow_asks_for_resync(hub):
+    subscriber = hub.subscribe(last_event_id=0)
+
+    assert [event['id'] for event in drain(subscriber)] == [1, 2, 3]
+    assert subscriber.needs_resync()
+
+
+def test_replay_from_a_pruned_id_asks_for_resync(hub):
+    hub._connection().execute('DELETE FROM events WHERE id <= 4')
+    subscriber = hub.subscribe(artwork_ids=[5, 6], last_event_id=2)
+
+    assert [event['id'] for event in drain(subscriber)] == [5, 6]
+    assert subscriber.needs_resync()
+
+    up_to_date = hub.subscribe(last_event_id=6)
+    assert not up_to_date.needs_resync()
+
+
+def test_stream_sends_resync_once(hub):
+    subscriber = hub.subscribe(last_event_id=0)
+    stream = hub.stream(subscriber)
+
+    assert next(stream).startswith('retry:')
+    assert next(stream).startswith('event: resync\n')
+    assert next(stream).startswith('id: 1\n')
+    assert not subscriber.needs_resync()
+    stream.close()
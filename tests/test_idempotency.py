@@ -0,0 +1,141 @@
+import hashlib
+import threading
+import pytest
+from flask import Flask, jsonify, request
+from flask_jwt_extended import JWTManager
+from models import db, IdempotencyKey
+from idempotency import idempotent
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'idempotency.db'}",
+        JWT_SECRET_KEY='test-secret',
+        IDEMPOTENCY_TTL_HOURS=24,
+        IDEMPOTENCY_WAIT_SECONDS=5,
+        IDEMPOTENCY_LOCK_SECONDS=120,
+    )
+    db.init_app(app)
+    JWTManager(app)
+    app.calls = 0
+    app.started = threading.Event()
+    app.proceed = threading.Event()
+    app.proceed.set()
+    app.status = 201
+
+    @app.route('/items', methods=['POST'])
+    @idempotent
+    def create_item():
+        app.calls += 1
+        app.started.set()
+        app.proceed.wait(5)
+        if app.status == 'raise':
+            raise RuntimeError('boom')
+        return jsonify({"call": app.calls, "name": request.form.get('name')}), app.status
+
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.drop_all()
+        db.engine.dispose()
+
+
+def post(client, key, **form):
+    return client.post('/items', data=form or {'name': 'a'}, headers={'Idempotency-Key': key})
+
+
+def test_retry_replays_the_stored_response(app):
+    client = app.test_client()
+    first = post(client, 'k1')
+    second = post(client, 'k1')
+
+    assert first.status_code == second.status_code == 201
+    assert second.json == first.json
+    assert second.headers['Idempotent-Replayed'] == 'true'
+    assert 'Idempotent-Replayed' not in first.headers
+    assert app.calls == 1
+
+
+def test_without_a_key_every_request_runs(app):
+    client = app.test_client()
+    client.post('/items', data={'name': 'a'})
+    client.post('/items', data={'name': 'a'})
+    assert app.calls == 2
+
+
+def test_key_reused_for_a_different_payload_is_rejected(app):
+    client = app.test_client()
+    post(client, 'k1', name='a')
+    response = post(client, 'k1', name='b')
+
+    assert response.status_code == 422
+    assert app.calls == 1
+
+
+def test_server_errors_release_the_key(app):
+    client = app.test_client()
+    app.status = 503
+    assert post(client, 'k1').status_code == 503
+
+    app.status = 201
+    response = post(client, 'k1')
+    assert response.status_code == 201
+    assert 'Idempotent-Replayed' not in response.headers
+    assert app.calls == 2
+
+
+def test_exceptions_release_the_key(app):
+    app.config['PROPAGATE_EXCEPTIONS'] = False
+    client = app.test_client()
+    app.status = 'raise'
+    assert post(client, 'k1').status_code == 500
+
+    app.status = 201
+    assert post(client, 'k1').status_code == 201
+    with app.app_context():
+        assert IdempotencyKey.query.one().status == 'completed'
+
+
+def test_concurrent_duplicate_waits_and_replays(app):
+    app.proceed.clear()
+    responses = {}
+
+    def send(name):
+        responses[name] = post(app.test_client(), 'k1')
+
+    owner = threading.Thread(target=send, args=('owner',))
+    owner.start()
+    assert app.started.wait(5)
+    duplicate = threading.Thread(target=send, args=('duplicate',))
+    duplicate.start()
+    duplicate.join(0.3)
+    assert duplicate.is_alive()  # Waiting on the pending key, not running the view
+
+    app.proceed.set()
+    owner.join(5)
+    duplicate.join(5)
+
+    assert app.calls == 1
+    assert responses['owner'].status_code == responses['duplicate'].status_code == 201
+    assert responses['duplicate'].json == responses['owner'].json
+    assert responses['duplicate'].headers['Idempotent-Replayed'] == 'true'
+
+
+def test_fingerprint_does_not_reveal_form_secrets(app):
+    client = app.test_client()
+    form = {'email': 'a@x.com', 'password': 'hunter2', 'username': 'a'}
+    post(client, 'k1', **form)
+
+    with app.app_context():
+        stored = IdempotencyKey.query.one().fingerprint
+    plain = hashlib.sha256(''.join(f"{name}={value}\n" for name, value in sorted(form.items())).encode())
+    assert stored != plain.hexdigest()
+
+    # The same payload under another secret gives another fingerprint
+    app.config['JWT_SECRET_KEY'] = 'other-secret'
+    assert post(client, 'k2', **form).status_code == 201
+    with app.app_context():
+        assert IdempotencyKey.query.filter_by(key='k2').one().fingerprint != stored
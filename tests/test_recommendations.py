@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+from recommendations import top_k_similar
+
+
+def brute_force(user_ids, artwork_ids, k, targets=None):
+    """Dense reference: cosine over distinct (user, artwork) pairs, top-K by (-score, id)."""
+    pairs = sorted(set(zip(user_ids.tolist(), artwork_ids.tolist())))
+    users = sorted({u for u, _ in pairs})
+    items = sorted({a for _, a in pairs})
+    X = np.zeros((len(users), len(items)))
+    for u, a in pairs:
+        X[users.index(u), items.index(a)] = 1
+    co_likes = X.T @ X
+    inv_norms = 1.0 / np.sqrt(X.sum(axis=0))
+
+    expected = {}
+    for i, item in enumerate(items):
+        if targets is not None and item not in targets:
+            continue
+        neighbours = [
+            (co_likes[i, j] * inv_norms[i] * inv_norms[j], other)
+            for j, other in enumerate(items)
+            if j != i and co_likes[i, j] > 0
+        ]
+        neighbours.sort(key=lambda n: (-n[0], n[1]))
+        if neighbours:
+            expected[item] = neighbours[:k]
+    return expected
+
+
+def as_dict(result):
+    src, dst, scores, ranks = result
+    actual = {}
+    for a, b, score, rank in zip(src.tolist(), dst.tolist(), scores.tolist(), ranks.tolist()):
+        actual.setdefault(a, []).append((rank, score, b))
+    return {a: [(score, b) for _, score, b in sorted(rows)] for a, rows in actual.items()}
+
+
+def assert_matches(actual, expected):
+    assert actual.keys() == expected.keys()
+    for item in expected:
+        assert [b for _, b in actual[item]] == [b for _, b in expected[item]], item
+        np.testing.assert_allclose([s for s, _ in actual[item]], [s for s, _ in expected[item]])
+
+
+@pytest.fixture
+def likes():
+    rng = np.random.default_rng(42)
+    user_ids = rng.integers(1, 40, size=400)
+    artwork_ids = rng.integers(100, 130, size=400)
+    # Repeat some likes: duplicates must count once
+    return np.concatenate([user_ids, user_ids[:50]]), np.concatenate([artwork_ids, artwork_ids[:50]])
+
+
+@pytest.mark.parametrize("k", [1, 3, 50])
+def test_matches_brute_force(likes, k):
+    user_ids, artwork_ids = likes
+    actual = as_dict(top_k_similar(user_ids, artwork_ids, k=k, block_size=7))
+    assert_matches(actual, brute_force(user_ids, artwork_ids, k))
+    for item, neighbours in actual.items():
+        assert item not in [b for _, b in neighbours]
+        assert len(neighbours) <= k
+
+
+def test_ties_are_broken_by_artwork_id():
+    # Artwork 1 is liked together with 4, 3 and 2 by one user each: identical scores
+    user_ids = np.array([1, 1, 2, 2, 3, 3])
+    artwork_ids = np.array([1, 4, 1, 3, 1, 2])
+    src, dst, scores, ranks = top_k_similar(user_ids, artwork_ids, k=2, targets=[1])
+    assert src.tolist() == [1, 1]
+    assert dst.tolist() == [2, 3]
+    assert ranks.tolist() == [1, 2]
+
+
+def test_duplicate_likes_count_once():
+    user_ids = np.array([1, 1, 1, 2])
+    artwork_ids = np.array([1, 1, 2, 2])
+    src, dst, scores, _ = top_k_similar(user_ids, artwork_ids)
+    # cos = 1 / sqrt(1 * 2) in both directions, not inflated by the repeated like
+    np.testing.assert_allclose(scores, [1 / np.sqrt(2)] * 2)
+
+
+def test_targets_limit_recomputed_rows(likes):
+    user_ids, artwork_ids = likes
+    targets = {101, 105, 117}
+    actual = as_dict(top_k_similar(user_ids, artwork_ids, k=5, targets=targets))
+    assert set(actual) == targets
+    assert_matches(actual, brute_force(user_ids, artwork_ids, 5, targets=targets))
+
+
+def test_subset_with_global_like_counts_matches_full(likes):
+    # What an incremental refresh loads: every like of the users who liked a target
+    user_ids, artwork_ids = likes
+    targets = {103, 111}
+    likers = np.unique(user_ids[np.isin(artwork_ids, list(targets))])
+    subset = np.isin(user_ids, likers)
+
+    pairs = np.unique(np.stack([user_ids, artwork_ids], axis=1), axis=0)
+    count_ids, counts = np.unique(pairs[:, 1], return_counts=True)
+
+    actual = as_dict(top_k_similar(user_ids[subset], artwork_ids[subset], k=5, targets=targets,
+                                   like_counts=(count_ids, counts)))
+    assert_matches(actual, brute_force(user_ids, artwork_ids, 5, targets=targets))
@@ -0,0 +1,150 @@
+import threading
+import time
+import pytest
+from resilience import (
+    OutboundClient, FakeProvider, CircuitOpenError, BulkheadFullError, OutboundTimeoutError,
+)
+
+
+class ProviderDown(Exception):
+    pass
+
+
+class BadFile(Exception):
+    pass
+
+
+def make_client(target, **kwargs):
+    options = dict(timeout=1.0, max_concurrent=2, failure_threshold=2, reset_timeout=0.2)
+    options.update(kwargs)
+    return OutboundClient('fake', target, **options)
+
+
+def test_breaker_opens_half_opens_and_closes():
+    failing = FakeProvider(error=ProviderDown('down'))
+    client = make_client(failing)
+
+    for _ in range(2):
+        with pytest.raises(ProviderDown):
+            client()
+    assert client.breaker.state == 'open'
+
+    # While open the provider is not called at all
+    with pytest.raises(CircuitOpenError) as excinfo:
+        client()
+    assert failing.calls == 2
+    assert excinfo.value.retry_after >= 1
+
+    time.sleep(0.25)
+    healthy = FakeProvider(result='ok')
+    with client.override(healthy):
+        assert client() == 'ok'  # the half-open probe
+    assert client.breaker.state == 'closed'
+    assert client.breaker.failures == 0
+
+    metrics = client.metrics()
+    assert metrics['failures'] == 2
+    assert metrics['short_circuited'] == 1
+    assert metrics['successes'] == 1
+
+
+def test_failed_probe_reopens_the_circuit():
+    client = make_client(FakeProvider(error=ProviderDown('down')))
+    for _ in range(2):
+        with pytest.raises(ProviderDown):
+            client()
+
+    time.sleep(0.25)
+    assert client.breaker.allow()
+    assert client.breaker.state == 'half_open'
+    client.breaker.cancel_probe()
+
+    with pytest.raises(ProviderDown):
+        client()  # the probe fails
+    assert client.breaker.state == 'open'
+    with pytest.raises(CircuitOpenError):
+        client()
+
+
+def test_half_open_lets_a_single_probe_through():
+    client = make_client(FakeProvider(error=ProviderDown('down')))
+    for _ in range(2):
+        with pytest.raises(ProviderDown):
+            client()
+
+    time.sleep(0.25)
+    assert client.breaker.allow()
+    assert not client.breaker.allow()
+
+
+def test_bulkhead_rejects_calls_beyond_max_concurrent():
+    release = threading.Event()
+    slow = FakeProvider(result=lambda: release.wait(2))
+    client = make_client(slow, timeout=2.0)
+
+    threads = [threading.Thread(target=client) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 1
+    while client.metrics()['in_flight'] < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    with pytest.raises(BulkheadFullError):
+        client()
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    metrics = client.metrics()
+    assert metrics['bulkhead_rejected'] == 1
+    assert metrics['in_flight'] == 0
+    assert slow.calls == 2
+    # A full bulkhead says nothing about the provider's health
+    assert client.breaker.state == 'closed'
+
+
+def test_slot_is_released_once_a_timed_out_call_returns():
+    slow = FakeProvider(result='late', latency=0.3)
+    client = make_client(slow, timeout=0.05, max_concurrent=1, failure_threshold=5)
+
+    with pytest.raises(OutboundTimeoutError):
+        client()
+    # The provider call is still running and still holds the only slot
+    assert client.metrics()['in_flight'] == 1
+    with pytest.raises(BulkheadFullError):
+        client()
+
+    time.sleep(0.4)
+    assert client.metrics()['in_flight'] == 0
+    with client.override(FakeProvider(result='ok')):
+        assert client() == 'ok'
+    assert client.metrics()['timeouts'] == 1
+
+
+def test_ignored_errors_do_not_trip_the_breaker():
+    bad_file = FakeProvider(error=BadFile('not an image'))
+    client = make_client(bad_file, ignore=(BadFile,))
+
+    for _ in range(5):
+        with pytest.raises(BadFile):
+            client()
+
+    assert client.breaker.state == 'closed'
+    assert client.breaker.failures == 0
+    assert bad_file.calls == 5
+    metrics = client.metrics()
+    assert metrics['client_errors'] == 5
+    assert metrics['failures'] == 0
+
+
+def test_fail_every_spaces_out_failures():
+    flaky = FakeProvider(result='ok', error=ProviderDown('blip'), fail_every=2)
+    client = make_client(flaky)
+
+    assert client() == 'ok'
+    with pytest.raises(ProviderDown):
+        client()
+    assert client() == 'ok'
+    # A success in between resets the consecutive failure count
+    assert client.breaker.state == 'closed'
+    assert client.breaker.failures == 0
@@ -0,0 +1,73 @@
+import time
+from user_cache import TTLCache, InvalidationLog
+
+
+def test_entries_expire_after_ttl():
+    cache = TTLCache(maxsize=10, ttl=0.05)
+    cache.set(1, 'a')
+    assert cache.get(1) == 'a'
+
+    time.sleep(0.06)
+    assert cache.get(1) is None
+    assert cache.stats()['size'] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set(1, 'a')
+    cache.set(2, 'b')
+    cache.get(1)  # 2 is now the least recently used
+    cache.set(3, 'c')
+
+    assert cache.get(2) is None
+    assert cache.get(1) == 'a'
+    assert cache.get(3) == 'c'
+    assert cache.stats()['evictions'] == 1
+
+
+def test_hits_and_misses_are_counted():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.get(1)
+    cache.set(1, 'a')
+    cache.get(1)
+    cache.get(1)
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (2, 1)
+    assert stats['hit_ratio'] == round(2 / 3, 4)
+
+
+def test_invalidation_reaches_other_workers(tmp_path):
+    path = str(tmp_path / 'invalidations.db')
+    # Two workers: each has its own cache and its own view of the shared log
+    log_a, cache_a = InvalidationLog(path), TTLCache(maxsize=10, ttl=60)
+    log_b, cache_b = InvalidationLog(path), TTLCache(maxsize=10, ttl=60)
+    log_a.apply(cache_a)
+    log_b.apply(cache_b)
+    cache_b.set(1, 'old')
+    cache_b.set(2, 'other')
+
+    cache_a.delete(1)
+    log_a.publish(1)
+
+    assert cache_b.get(1) == 'old'  # Not applied yet
+    log_b.apply(cache_b)
+    assert cache_b.get(1) is None
+    assert cache_b.get(2) == 'other'
+
+
+def test_invalidations_before_the_first_lookup_are_skipped(tmp_path):
+    path = str(tmp_path / 'invalidations.db')
+    InvalidationLog(path).publish(1)
+
+    log, cache = InvalidationLog(path), TTLCache(maxsize=10, ttl=60)
+    first = log.apply(cache)
+    cache.set(1, 'fresh')
+
+    assert log.apply(cache) == first
+    assert cache.get(1) == 'fresh'
+
+
+def test_unreadable_log_disables_the_cache(tmp_path):
+    log = InvalidationLog(str(tmp_path / 'missing' / 'invalidations.db'))
+    assert log.apply(TTLCache(maxsize=10, ttl=60)) is None
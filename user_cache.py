@@ -0,0 +1,187 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from models import db, User
+
+logger = logging.getLogger(__name__)
+
+# Cache settings (override in .env)
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 1024))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", 10))
+USER_CACHE_SYNC_PATH = os.getenv("USER_CACHE_SYNC_PATH", "/tmp/user_cache_invalidations.db")
+
+
+class TTLCache:
+    """
+    Small thread-safe LRU cache whose entries expire after `ttl` seconds.
+
+    Each gunicorn worker has its own copy. Writes reach the other workers
+    through InvalidationLog; the short TTL is only a backstop.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class InvalidationLog:
+    """
+    Invalidated cache keys, shared by the gunicorn workers on this host.
+
+    Writers append the key to a SQLite file (like events.EventHub). Before
+    each lookup a worker drops every key appended since it last looked, so
+    a user reading back their own change on another worker never gets the
+    old copy. That check is a local file read, not a database round trip.
+
+    Rows are pruned after `retention` seconds, which must exceed the cache
+    TTL: by then every entry they could refer to has expired anyway.
+    """
+
+    def __init__(self, path, retention=300):
+        self.path = path
+        self.retention = retention
+        self._last_id = None
+        self._last_prune = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            with self._schema_lock:
+                if not self._schema_ready:
+                    conn.execute('PRAGMA journal_mode=WAL')
+                    conn.execute(
+                        'CREATE TABLE IF NOT EXISTS invalidations ('
+                        'id INTEGER PRIMARY KEY AUTOINCREMENT, created_at REAL NOT NULL, key INTEGER NOT NULL)'
+                    )
+                    self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+    def _reset_connection(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            conn.close()
+
+    def publish(self, key):
+        """Called after the database commit so other workers reload the new row."""
+        now = time.time()
+        try:
+            conn = self._connection()
+            conn.execute('INSERT INTO invalidations (created_at, key) VALUES (?, ?)', (now, key))
+            if now - self._last_prune > 60:
+                conn.execute('DELETE FROM invalidations WHERE created_at < ?', (now - self.retention,))
+                self._last_prune = now
+        except sqlite3.Error as e:
+            logger.warning(f"Could not publish cache invalidation for {key}: {e}")
+            self._reset_connection()
+
+    @property
+    def position(self):
+        return self._last_id
+
+    def apply(self, cache):
+        """
+        Drop keys invalidated since the last call from `cache`.
+
+        Returns the log position reached, or None when the log can't be read,
+        in which case the caller should not trust the cache for this lookup.
+        """
+        with self._lock:
+            try:
+                conn = self._connection()
+                if self._last_id is None:
+                    # Nothing is cached before the first lookup, so older rows don't matter
+                    self._last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM invalidations').fetchone()[0]
+                    return self._last_id
+                rows = conn.execute(
+                    'SELECT id, key FROM invalidations WHERE id > ? ORDER BY id', (self._last_id,)
+                ).fetchall()
+            except sqlite3.Error as e:
+                logger.warning(f"Could not read cache invalidations: {e}")
+                self._reset_connection()
+                return None
+            for row_id, key in rows:
+                cache.delete(key)
+                self._last_id = row_id
+            return self._last_id
+
+
+user_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+invalidations = InvalidationLog(USER_CACHE_SYNC_PATH)
+
+
+def get_user_record(user_id):
+    """Returns the serialized user (User.to_dict()) or None, using the cache."""
+    position = invalidations.apply(user_cache)
+    record = user_cache.get(user_id) if position is not None else None
+    if record is None:
+        user = db.session.get(User, user_id)
+        if not user:
+            return None
+        record = user.to_dict()
+        # An invalidation applied by another thread during the load may cover this row
+        if position is not None and invalidations.position == position:
+            user_cache.set(user_id, record)
+    return dict(record)
+
+
+def invalidate_user(user_id):
+    """Drop the user from this worker's cache and, through the log, every other worker's."""
+    user_cache.delete(user_id)
+    invalidations.publish(user_id)